@@ -2,14 +2,18 @@
 from functools import lru_cache
 from pathlib import Path
 import chromadb
-from chromadb import PersistentClient
+from chromadb import Collection, PersistentClient
+from fastapi import FastAPI, Request
+from openai import AsyncOpenAI
 
 from app.settings import Settings
+from app.rag.retriever import Retriever
+from app.rag.build_index import collection_metadata
 
 
-@lru_cache
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    """Get cached settings instance."""
+    """Get cached settings instance (.env is read and validated once)."""
     return Settings()
 
 
@@ -20,3 +24,38 @@ def get_chroma_client() -> PersistentClient:
     chroma_path = Path(settings.CHROMA_PATH)
     chroma_path.mkdir(parents=True, exist_ok=True)
     return chromadb.PersistentClient(path=str(chroma_path))
+
+
+def open_index(app: FastAPI) -> None:
+    """Open the collection and build the retriever on app.state.
+
+    Runs at startup and again after every ingest, since an ingest may have
+    recreated the collection (e.g. after an embedding dimension change).
+    """
+    settings = get_settings()
+    collection = get_chroma_client().get_or_create_collection(
+        name=Retriever.COLLECTION_NAME,
+        metadata=collection_metadata(settings.OPENAI_EMBED_MODEL, settings.OPENAI_EMBED_DIMENSIONS)
+    )
+    app.state.collection = collection
+    app.state.retriever = Retriever(
+        collection=collection,
+        openai_client=app.state.openai_async_client,
+        embed_model=settings.OPENAI_EMBED_MODEL,
+        embed_dimensions=settings.OPENAI_EMBED_DIMENSIONS
+    )
+
+
+def get_collection(request: Request) -> Collection:
+    """Get the shared collection handle opened at app startup."""
+    return request.app.state.collection
+
+
+def get_openai_client(request: Request) -> AsyncOpenAI:
+    """Get the shared async OpenAI client created at app startup."""
+    return request.app.state.openai_async_client
+
+
+def get_retriever(request: Request) -> Retriever:
+    """Get the shared retriever created at app startup."""
+    return request.app.state.retriever
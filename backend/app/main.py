@@ -1,19 +1,49 @@
 """FastAPI application entry point."""
+from contextlib import asynccontextmanager
+
+import httpx
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from openai import AsyncOpenAI
 
-from app.deps import get_settings
+from app.deps import get_settings, open_index
 from app.middleware import RequestLoggingMiddleware
 from app.routers import health, ingest, ask
 
 # Initialize settings
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create long-lived clients on startup and close them on shutdown."""
+    # One pooled HTTP/2 connection set for all OpenAI calls, so TLS
+    # handshakes are amortized and embedding + chat share connections
+    openai_async_client = AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        http_client=httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=30.0
+        )
+    )
+    app.state.openai_async_client = openai_async_client
+
+    # Open the collection; ingest reopens it when it finishes
+    open_index(app)
+
+    yield
+
+    await openai_async_client.close()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="UW-Parkside RAG Chatbot API",
     description="RAG-powered chatbot for UW-Parkside website content",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -21,10 +51,13 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins_list,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type", "authorization"],
 )
 
+# Compress larger responses (answers + source lists); pure ASGI middleware
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Add request logging middleware
 app.add_middleware(RequestLoggingMiddleware)
 
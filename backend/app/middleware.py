@@ -1,26 +1,43 @@
 """Custom middleware for FastAPI app."""
 import time
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Log all incoming requests with timing information."""
+class RequestLoggingMiddleware:
+    """Log all incoming requests with timing information.
 
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+    Implemented as a pure ASGI middleware so requests pass straight through
+    without the per-request task group and stream wrappers that
+    ``BaseHTTPMiddleware`` allocates.
+    """
 
-        # Process request
-        response = await call_next(request)
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        # Calculate duration
-        duration = time.time() - start_time
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        # Log request
-        print(
-            f"{request.method} {request.url.path} "
-            f"- {response.status_code} "
-            f"({duration:.3f}s)"
-        )
+        start_time = time.perf_counter()
+        status_code = 500
 
-        return response
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            # Process request
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Calculate duration
+            duration = time.perf_counter() - start_time
+
+            # Log request
+            print(
+                f"{scope['method']} {scope['path']} "
+                f"- {status_code} "
+                f"({duration:.3f}s)"
+            )
@@ -1,6 +1,6 @@
 """Pydantic models for API request/response validation."""
 from typing import List, Optional, Literal
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class AskRequest(BaseModel):
@@ -21,13 +21,26 @@ class AskResponse(BaseModel):
     sources: List[Source]
 
 
+class HealthResponse(BaseModel):
+    """Response model for /health endpoint."""
+    status: str
+    embed_model: str
+    chat_model: str
+    collection_exists: bool
+    chunk_count: int
+
+
 class IngestStartRequest(BaseModel):
     """Request model for /ingest/start endpoint."""
+    model_config = ConfigDict(frozen=True)
+
     max_pages: Optional[int] = Field(default=None, ge=10, le=2000)
 
 
 class IngestStatus(BaseModel):
     """Ingest status information."""
+    model_config = ConfigDict(frozen=True)
+
     status: Literal["idle", "running", "done", "error"]
     pages_scraped: int = 0
     chunks_indexed: int = 0
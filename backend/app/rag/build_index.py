@@ -1,53 +1,140 @@
 """Build ChromaDB index from scraped documents."""
-from typing import List, Dict, Tuple, Optional
-import json
+from typing import List, Dict, AsyncIterable, AsyncIterator, Callable, Iterator, Set, Tuple, Optional
+import asyncio
+import os
+import sqlite3
+from contextlib import closing
 from datetime import datetime
 from pathlib import Path
+import numpy as np
+import orjson
+from blake3 import blake3
 import tiktoken
-from openai import OpenAI
+from openai import NOT_GIVEN, AsyncOpenAI, OpenAI
 import chromadb
 from chromadb import PersistentClient
 
 
+# Collection metadata keys recording the embeddings it was built with
+EMBED_CONFIG_KEYS = ("embed_model", "embed_dimensions")
+
+
+def collection_metadata(embed_model: str, embed_dimensions: Optional[int] = None) -> dict:
+    """Metadata for the collection, including its embedding settings."""
+    return {
+        "description": "UW-Parkside website content",
+        "embed_model": embed_model,
+        "embed_dimensions": embed_dimensions or 0  # 0 = model default
+    }
+
+
 class IndexBuilder:
     """Build and populate ChromaDB vector index."""
 
     COLLECTION_NAME = "uwp"
     CHUNK_SIZE = 350  # tokens
     BATCH_SIZE = 100  # for embedding API calls
+    DOC_BATCH_SIZE = 64  # documents tokenized per encode_batch call
+    EMBED_CONCURRENCY = 35  # max in-flight embedding requests
+    ADD_BATCH_SIZE = 250  # chunks per Chroma write transaction
 
     def __init__(
         self,
         chroma_path: str = ".chroma",
         embed_model: str = "text-embedding-3-small",
-        openai_api_key: str = None
+        openai_api_key: str = None,
+        add_batch_size: int = ADD_BATCH_SIZE,
+        embed_batch_size: int = BATCH_SIZE,
+        bulk_mode: bool = False,
+        embed_dimensions: Optional[int] = None,
+        on_collection_recreated: Optional[Callable[[], None]] = None
     ):
+        self.add_batch_size = add_batch_size
+        self.embed_batch_size = embed_batch_size
         self.chroma_client = chromadb.PersistentClient(path=chroma_path)
+        if bulk_mode:
+            self.enable_wal(chroma_path)
         self.embed_model = embed_model
+        self.embed_dimensions = embed_dimensions
+        # Called once a reset has replaced the collection, so readers holding
+        # the dropped one can reopen it before indexing starts
+        self.on_collection_recreated = on_collection_recreated
+        self.openai_api_key = openai_api_key
         self.openai_client = OpenAI(api_key=openai_api_key)
         self.tokenizer = tiktoken.get_encoding("cl100k_base")
 
+    @staticmethod
+    def enable_wal(chroma_path: str) -> None:
+        """Switch Chroma's SQLite store to write-ahead logging.
+
+        WAL makes each write transaction an append instead of a rollback
+        journal rewrite, and lets the API keep reading while ingest writes.
+        The journal mode is stored in the database file, so it also applies
+        to Chroma's own connections.
+        """
+        db_path = Path(chroma_path) / "chroma.sqlite3"
+        try:
+            with closing(sqlite3.connect(db_path, timeout=5.0)) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error as e:
+            print(f"Could not enable WAL on {db_path}: {e}")
+
     def chunk_text(self, text: str, metadata: Dict) -> List[Tuple[str, dict, int]]:
         """Split text into chunks of ~CHUNK_SIZE tokens.
 
         Returns:
             List of (chunk_text, metadata, token_count) tuples
         """
-        tokens = self.tokenizer.encode(text)
+        return self.chunk_texts([text], [metadata])
+
+    def chunk_texts(
+        self,
+        texts: List[str],
+        metadatas: List[Dict]
+    ) -> List[Tuple[str, dict, int]]:
+        """Split many texts into chunks of ~CHUNK_SIZE tokens.
+
+        Encoding and decoding run through tiktoken's batch APIs so the BPE
+        work happens in parallel in Rust rather than one call per chunk.
+
+        Args:
+            texts: Texts to chunk
+            metadatas: Base metadata for each text (same length as texts)
+
+        Returns:
+            List of (chunk_text, metadata, token_count) tuples, in text order
+        """
+        all_tokens = self.tokenizer.encode_batch(texts, num_threads=os.cpu_count() or 1)
+
+        # Compute chunk boundaries for every text up front
+        spans = []
+        for text_idx, tokens in enumerate(all_tokens):
+            for start in range(0, len(tokens), self.CHUNK_SIZE):
+                spans.append((text_idx, start, min(start + self.CHUNK_SIZE, len(tokens))))
+
+        decoded = self.tokenizer.decode_batch(
+            [all_tokens[text_idx][start:end] for text_idx, start, end in spans],
+            num_threads=os.cpu_count() or 1
+        )
+
         chunks = []
+        chunk_index = 0
+        prev_text_idx = None
 
-        for i in range(0, len(tokens), self.CHUNK_SIZE):
-            chunk_tokens = tokens[i:i + self.CHUNK_SIZE]
-            chunk_text = self.tokenizer.decode(chunk_tokens)
-            token_count = len(chunk_tokens)
+        for (text_idx, start, end), chunk_text in zip(spans, decoded):
+            if text_idx != prev_text_idx:
+                chunk_index = 0
+                prev_text_idx = text_idx
 
+            token_count = end - start
             chunk_metadata = {
-                **metadata,
+                **metadatas[text_idx],
                 "token_count": token_count,
-                "chunk_index": len(chunks)
+                "chunk_index": chunk_index
             }
 
             chunks.append((chunk_text, chunk_metadata, token_count))
+            chunk_index += 1
 
         return chunks
 
@@ -62,93 +149,293 @@ class IndexBuilder:
         """
         response = self.openai_client.embeddings.create(
             model=self.embed_model,
-            input=texts
+            input=texts,
+            dimensions=self.embed_dimensions or NOT_GIVEN
         )
         return [item.embedding for item in response.data]
 
-    def build_index(self, jsonl_path: Path, reset: bool = True) -> dict:
-        """Build ChromaDB index from JSONL file.
+    def clear_collection(self, collection, keep_ids: Optional[Set[str]] = None) -> None:
+        """Delete every chunk in the collection, keeping the collection itself.
 
-        Args:
-            jsonl_path: Path to JSONL file with scraped docs
-            reset: If True, delete existing collection and create new one
+        Clearing in place (rather than deleting the collection) keeps the
+        collection handle held by a running API server valid.
 
-        Returns:
-            Stats dict with counts and metadata
+        Args:
+            collection: Collection to clear
+            keep_ids: Chunk IDs to leave in place (for pruning stale chunks)
         """
-        print(f"Building index from {jsonl_path}")
+        ids = collection.get(include=[])["ids"]
+        if keep_ids:
+            ids = [chunk_id for chunk_id in ids if chunk_id not in keep_ids]
 
-        # Load documents
-        documents = []
-        with open(jsonl_path, "r", encoding="utf-8") as f:
+        for start in range(0, len(ids), self.add_batch_size):
+            collection.delete(ids=ids[start:start + self.add_batch_size])
+
+        if ids:
+            print(f"✓ Cleared {len(ids)} chunks from collection '{self.COLLECTION_NAME}'")
+
+    def iter_documents(self, jsonl_path: Path) -> Iterator[dict]:
+        """Yield scraped documents from a JSONL file one line at a time."""
+        with open(jsonl_path, "rb") as f:
             for line in f:
-                documents.append(json.loads(line))
+                if line.strip():
+                    yield orjson.loads(line)
+
+    @staticmethod
+    def _embedding_matrix(data: list) -> np.ndarray:
+        """Copy an embeddings response into a (batch, dim) float32 array."""
+        matrix = np.empty((len(data), len(data[0].embedding)), dtype=np.float32)
+        for row, item in enumerate(data):
+            matrix[row] = item.embedding
+        return matrix
+
+    @staticmethod
+    def chunk_id(url: str, title: str, chunk_index: int, text: str) -> str:
+        """Content-addressed chunk ID (128-bit BLAKE3 hex digest).
+
+        Covers everything the chunk's metadata is derived from, so an
+        unchanged ID means both text and metadata are unchanged.
+        """
+        key = f"{url}\n{title}\n{chunk_index}\n{text}".encode("utf-8")
+        return blake3(key).hexdigest(length=16)
 
-        print(f"✓ Loaded {len(documents)} documents")
+    def _chunk_group(self, group: List[dict]) -> List[Tuple[str, str, dict]]:
+        """Chunk a group of documents in one batched call.
 
-        # Get or create collection
-        if reset:
+        Returns:
+            List of (id, text, metadata) tuples
+        """
+        metadatas = [
+            {
+                "url": doc["url"],
+                "title": doc.get("title") or "Untitled"  # Convert None to "Untitled"
+            }
+            for doc in group
+        ]
+        chunks = self.chunk_texts([doc["text"] for doc in group], metadatas)
+
+        return [
+            (
+                self.chunk_id(metadata["url"], metadata["title"], metadata["chunk_index"], text),
+                text,
+                metadata
+            )
+            for text, metadata, _ in chunks
+        ]
+
+    async def _index_documents_async(
+        self,
+        collection,
+        documents: AsyncIterable[dict],
+        incremental: bool = False
+    ) -> Tuple[int, int, Set[str]]:
+        """Chunk, embed and add a stream of documents to the collection.
+
+        A producer reads documents as they arrive, tokenizes them
+        DOC_BATCH_SIZE at a time (in a worker thread, since tokenization is
+        CPU-bound) and puts embedding batches on a bounded queue;
+        EMBED_CONCURRENCY consumers embed them and buffer the results, which
+        are written to Chroma add_batch_size chunks at a time. Writes run in a
+        worker thread, one at a time, so embedding continues while a batch
+        is being committed.
+
+        In incremental mode, chunks whose ID is already in the collection
+        are skipped before embedding.
+
+        Returns:
+            Tuple of (documents read, chunks indexed, chunk IDs seen)
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.EMBED_CONCURRENCY)
+        buffer_ids, buffer_texts, buffer_metadatas, buffer_embeddings = [], [], [], []
+        total_documents = 0
+        total_chunks = 0
+        embedded_chunks = 0
+        seen_ids: Set[str] = set()
+
+        write_lock = asyncio.Lock()
+
+        async def flush(final: bool = False) -> None:
+            # Add to collection in large slices (one SQLite transaction each)
+            if len(buffer_ids) < self.add_batch_size and not final:
+                return  # Nothing to write; don't queue behind an in-flight write
+
+            async with write_lock:
+                while len(buffer_ids) >= self.add_batch_size or (final and buffer_ids):
+                    n = self.add_batch_size
+                    ids, embeddings = buffer_ids[:n], buffer_embeddings[:n]
+                    texts, metadatas = buffer_texts[:n], buffer_metadatas[:n]
+                    for buffer in (buffer_ids, buffer_texts, buffer_metadatas, buffer_embeddings):
+                        del buffer[:n]
+
+                    await asyncio.to_thread(
+                        collection.add,
+                        ids=ids,
+                        embeddings=np.stack(embeddings),
+                        documents=texts,
+                        metadatas=metadatas
+                    )
+
+        async def produce() -> None:
+            nonlocal total_documents
+            group, pending = [], []
+
+            async def enqueue(final: bool = False) -> None:
+                if group:
+                    for chunk in await asyncio.to_thread(self._chunk_group, list(group)):
+                        if chunk[0] not in seen_ids:  # Drop duplicate pages
+                            seen_ids.add(chunk[0])
+                            pending.append(chunk)
+                    group.clear()
+                n = self.embed_batch_size
+                while len(pending) >= n or (final and pending):
+                    batch = pending[:n]
+                    del pending[:n]
+                    await queue.put(batch)
+
+            async for doc in documents:
+                group.append(doc)
+                total_documents += 1
+                if len(group) >= self.DOC_BATCH_SIZE:
+                    await enqueue()
+
+            await enqueue(final=True)
+
+            for _ in range(self.EMBED_CONCURRENCY):
+                await queue.put(None)
+
+        async def consume(client: AsyncOpenAI) -> None:
+            nonlocal total_chunks, embedded_chunks
+            while (batch := await queue.get()) is not None:
+                total_chunks += len(batch)
+                if incremental:
+                    # Skip chunks that are already indexed unchanged
+                    existing = await asyncio.to_thread(
+                        collection.get,
+                        ids=[chunk_id for chunk_id, _, _ in batch],
+                        include=[]
+                    )
+                    existing_ids = set(existing["ids"])
+                    batch = [chunk for chunk in batch if chunk[0] not in existing_ids]
+                    if not batch:
+                        continue
+
+                texts = [text for _, text, _ in batch]
+                response = await client.embeddings.create(
+                    model=self.embed_model,
+                    input=texts,
+                    dimensions=self.embed_dimensions or NOT_GIVEN
+                )
+
+                buffer_ids.extend(chunk_id for chunk_id, _, _ in batch)
+                buffer_texts.extend(texts)
+                buffer_metadatas.extend(metadata for _, _, metadata in batch)
+                buffer_embeddings.extend(self._embedding_matrix(response.data))
+
+                embedded_chunks += len(batch)
+                print(f"Embedded {embedded_chunks} chunks ({total_chunks} seen)")
+                await flush()
+
+        # Use a client scoped to the running event loop
+        async with AsyncOpenAI(api_key=self.openai_api_key) as client:
+            tasks = [
+                asyncio.ensure_future(produce()),
+                *[asyncio.ensure_future(consume(client)) for _ in range(self.EMBED_CONCURRENCY)]
+            ]
             try:
-                self.chroma_client.delete_collection(name=self.COLLECTION_NAME)
-                print(f"✓ Deleted existing collection '{self.COLLECTION_NAME}'")
-            except:
-                pass
+                await asyncio.gather(*tasks)
+            finally:
+                # gather leaves the other tasks running when one fails
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        await flush(final=True)
+        return total_documents, total_chunks, seen_ids
+
+    def open_collection(self, reset: bool = True):
+        """Get or create the collection for the configured embeddings.
+
+        A collection's vector width is fixed by its first embedding, and
+        clearing it keeps that width. The collection therefore records the
+        embedding model and dimensions it was built with. On reset, a
+        collection built with other settings is dropped and recreated (then
+        on_collection_recreated is called); an incremental update of one is
+        refused.
+
+        Args:
+            reset: If True, start from an empty collection
+
+        Returns:
+            Collection ready for indexing
+
+        Raises:
+            ValueError: If not resetting and the collection was built with
+                different embedding settings
+        """
+        metadata = collection_metadata(self.embed_model, self.embed_dimensions)
+        embed_config = {key: metadata[key] for key in EMBED_CONFIG_KEYS}
 
         collection = self.chroma_client.get_or_create_collection(
             name=self.COLLECTION_NAME,
-            metadata={"description": "UW-Parkside website content"}
+            metadata=metadata
         )
+        stored = {key: (collection.metadata or {}).get(key) for key in embed_config}
 
-        # Chunk all documents
-        all_chunks = []
-        for page_idx, doc in enumerate(documents):
-            metadata = {
-                "url": doc["url"],
-                "title": doc.get("title") or "Untitled",  # Convert None to "Untitled"
-                "page_index": page_idx
-            }
-            chunks = self.chunk_text(doc["text"], metadata)
-            all_chunks.extend(chunks)
-
-        print(f"✓ Created {len(all_chunks)} chunks from {len(documents)} documents")
+        if stored == embed_config:
+            if reset:
+                self.clear_collection(collection)
+            return collection
 
-        # Process in batches for embedding
-        total_chunks = len(all_chunks)
+        if reset:
+            # Settings changed (or unrecorded): rebuild so the width can change
+            self.chroma_client.delete_collection(name=self.COLLECTION_NAME)
+            collection = self.chroma_client.create_collection(name=self.COLLECTION_NAME, metadata=metadata)
+            print(f"✓ Recreated collection '{self.COLLECTION_NAME}' for {embed_config}")
+            if self.on_collection_recreated:
+                self.on_collection_recreated()
+            return collection
+
+        if all(value is None for value in stored.values()):
+            # Collection predates recorded settings; adopt the current ones
+            collection.modify(metadata=metadata)
+            return collection
+
+        raise ValueError(
+            f"Collection '{self.COLLECTION_NAME}' was built with {stored}, but the "
+            f"current settings are {embed_config}. Rebuild it with a full re-index "
+            f"(INGEST_INCREMENTAL=false, or build_index without --no-reset)."
+        )
 
-        for batch_start in range(0, total_chunks, self.BATCH_SIZE):
-            batch_end = min(batch_start + self.BATCH_SIZE, total_chunks)
-            batch = all_chunks[batch_start:batch_end]
+    async def build_index_async(self, documents: AsyncIterable[dict], reset: bool = True) -> dict:
+        """Build ChromaDB index from an async stream of documents.
 
-            print(f"Processing batch {batch_start//self.BATCH_SIZE + 1}: chunks {batch_start+1}-{batch_end}/{total_chunks}")
+        Documents are chunked, embedded and written in bounded batches as they
+        arrive, so indexing can overlap with a crawl that is still running.
 
-            # Extract texts and metadata
-            texts = [chunk[0] for chunk in batch]
-            metadatas = [chunk[1] for chunk in batch]
+        Args:
+            documents: Async iterable of dicts with url, title, text
+            reset: If True, clear the existing collection before indexing;
+                otherwise only new or changed chunks are embedded and chunks
+                no longer present in the documents are removed
 
-            # Generate embeddings
-            embeddings = self.embed_texts(texts)
+        Returns:
+            Stats dict with counts and metadata
+        """
+        collection = self.open_collection(reset=reset)
 
-            # Generate IDs
-            ids = []
-            for chunk_meta in metadatas:
-                page_idx = chunk_meta["page_index"]
-                chunk_idx = chunk_meta["chunk_index"]
-                ids.append(f"{page_idx}-{chunk_idx}")
+        total_documents, total_chunks, seen_ids = await self._index_documents_async(
+            collection, documents, incremental=not reset
+        )
 
-            # Add to collection
-            collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                documents=texts,
-                metadatas=metadatas
-            )
+        if not reset:
+            self.clear_collection(collection, keep_ids=seen_ids)
 
-        print(f"✓ Indexed {total_chunks} chunks")
+        print(f"✓ Indexed {total_chunks} chunks from {total_documents} documents")
 
         # Generate stats
         stats = {
             "created_at": datetime.now().isoformat(),
-            "total_documents": len(documents),
+            "total_documents": total_documents,
             "total_chunks": total_chunks,
             "embed_model": self.embed_model,
             "collection_name": self.COLLECTION_NAME
@@ -156,11 +443,32 @@ class IndexBuilder:
 
         return stats
 
+    def build_index(self, jsonl_path: Path, reset: bool = True) -> dict:
+        """Build ChromaDB index from JSONL file.
+
+        Documents are streamed from the file and chunked, embedded and
+        written in bounded batches, so memory does not grow with corpus size.
+
+        Args:
+            jsonl_path: Path to JSONL file with scraped docs
+            reset: If True, clear the existing collection before indexing;
+                otherwise update it incrementally
+
+        Returns:
+            Stats dict with counts and metadata
+        """
+        print(f"Building index from {jsonl_path}")
+
+        async def documents() -> AsyncIterator[dict]:
+            for doc in self.iter_documents(jsonl_path):
+                yield doc
+
+        return asyncio.run(self.build_index_async(documents(), reset=reset))
+
     def save_stats(self, stats: Dict, output_path: Path) -> None:
         """Save indexing stats to JSON file."""
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(stats, f, indent=2)
+        output_path.write_bytes(orjson.dumps(stats, option=orjson.OPT_INDENT_2))
         print(f"✓ Saved stats to {output_path}")
 
 
@@ -168,7 +476,6 @@ def main():
     """CLI entry point for building index."""
     import argparse
     from dotenv import load_dotenv
-    import os
 
     load_dotenv()
 
@@ -194,7 +501,7 @@ def main():
     parser.add_argument(
         "--no-reset",
         action="store_true",
-        help="Don't delete existing collection"
+        help="Update the existing collection incrementally instead of rebuilding it"
     )
 
     args = parser.parse_args()
@@ -206,11 +513,13 @@ def main():
         return
 
     embed_model = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+    embed_dimensions = int(os.getenv("OPENAI_EMBED_DIMENSIONS") or 0) or None
 
     builder = IndexBuilder(
         chroma_path=args.chroma_path,
         embed_model=embed_model,
-        openai_api_key=api_key
+        openai_api_key=api_key,
+        embed_dimensions=embed_dimensions
     )
 
     stats = builder.build_index(args.input, reset=not args.no_reset)
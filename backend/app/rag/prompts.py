@@ -1,6 +1,8 @@
 """System prompts for RAG chat completion."""
 
 from typing import List, Dict, Tuple, Optional
+import hashlib
+
 SYSTEM_PROMPT = """
 You are Ask Geo — a friendly, student‑facing assistant for the University of Wisconsin–Parkside.
 
@@ -74,6 +76,19 @@ Never include content that is not grounded in the provided context.
 """
 
 
+# Stable identifier for the system prompt prefix. The prompt contains no
+# interpolated values, so OpenAI prompt caching sees an identical prefix on
+# every request.
+PROMPT_CACHE_KEY = "askgeo-" + hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16]
+
+CHUNK_TEMPLATE = "[{index}] (from {title} - {url})\n{text}"
+
+USER_MESSAGE_TEMPLATE = """Question: {question}
+
+Context:
+{context}"""
+
+
 def build_user_message(question: str, chunks: List[Tuple[str, dict]]) -> str:
     """Build user message with question and numbered context chunks.
 
@@ -84,15 +99,14 @@ def build_user_message(question: str, chunks: List[Tuple[str, dict]]) -> str:
     Returns:
         Formatted user message string
     """
-    context_parts = []
-    for i, (text, metadata) in enumerate(chunks, 1):
-        title = metadata.get("title", "Untitled")
-        url = metadata.get("url", "")
-        context_parts.append(f"[{i}] (from {title} - {url})\n{text}")
-
-    context_text = "\n\n".join(context_parts)
-
-    return f"""Question: {question}
-
-Context:
-{context_text}"""
+    context_text = "\n\n".join([
+        CHUNK_TEMPLATE.format(
+            index=i,
+            title=metadata.get("title", "Untitled"),
+            url=metadata.get("url", ""),
+            text=text
+        )
+        for i, (text, metadata) in enumerate(chunks, 1)
+    ])
+
+    return USER_MESSAGE_TEMPLATE.format(question=question, context=context_text)
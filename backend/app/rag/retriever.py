@@ -1,7 +1,23 @@
 """Retrieval functions for querying ChromaDB."""
 from typing import List, Dict, Tuple, Optional
-from chromadb import PersistentClient
-from openai import OpenAI
+from collections import OrderedDict
+import asyncio
+import re
+import numpy as np
+from chromadb import Collection
+from openai import NOT_GIVEN, AsyncOpenAI
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a question for cache lookups (case and whitespace only).
+
+    Punctuation is kept: "C++" vs "C#" or "2.5" vs "25" are different
+    questions and must not share a cache entry.
+    """
+    return _WHITESPACE_RE.sub(" ", query.lower()).strip()
 
 
 class Retriever:
@@ -9,33 +25,47 @@ class Retriever:
 
     COLLECTION_NAME = "uwp"
     SIMILARITY_THRESHOLD = 0.2  # Minimum similarity score
+    EMBED_CACHE_SIZE = 1024  # Query embeddings kept in memory
 
     def __init__(
         self,
-        chroma_client: PersistentClient,
-        openai_client: OpenAI,
-        embed_model: str = "text-embedding-3-small"
+        collection: Collection,
+        openai_client: AsyncOpenAI,
+        embed_model: str = "text-embedding-3-small",
+        embed_dimensions: Optional[int] = None
     ):
-        self.chroma_client = chroma_client
+        self.collection = collection
         self.openai_client = openai_client
         self.embed_model = embed_model
+        self.embed_dimensions = embed_dimensions
+        self._embed_cache: OrderedDict[str, List[float]] = OrderedDict()
+
+    async def embed_query(self, query: str) -> List[float]:
+        """Generate embedding for query text.
 
-        # Get collection
-        try:
-            self.collection = chroma_client.get_collection(name=self.COLLECTION_NAME)
-        except Exception:
-            # Collection doesn't exist yet
-            self.collection = None
+        Embeddings are cached (LRU) by normalized question, so repeated
+        questions skip the embeddings API entirely.
+        """
+        key = normalize_query(query)
+        cached = self._embed_cache.get(key)
+        if cached is not None:
+            self._embed_cache.move_to_end(key)
+            return cached
 
-    def embed_query(self, query: str) -> List[float]:
-        """Generate embedding for query text."""
-        response = self.openai_client.embeddings.create(
+        response = await self.openai_client.embeddings.create(
             model=self.embed_model,
-            input=[query]
+            input=[query],
+            dimensions=self.embed_dimensions or NOT_GIVEN
         )
-        return response.data[0].embedding
+        embedding = response.data[0].embedding
 
-    def query(self, question: str, k: int = 5) -> List[dict]:
+        self._embed_cache[key] = embedding
+        if len(self._embed_cache) > self.EMBED_CACHE_SIZE:
+            self._embed_cache.popitem(last=False)
+
+        return embedding
+
+    async def query(self, question: str, k: int = 5) -> List[dict]:
         """Retrieve top-k relevant chunks for a question.
 
         Args:
@@ -45,14 +75,12 @@ class Retriever:
         Returns:
             List of dicts with keys: text, url, title, score
         """
-        if not self.collection:
-            return []
-
         # Generate query embedding
-        query_embedding = self.embed_query(question)
+        query_embedding = await self.embed_query(question)
 
-        # Query ChromaDB
-        results = self.collection.query(
+        # Query ChromaDB off the event loop (HNSW search is CPU-bound)
+        results = await asyncio.to_thread(
+            self.collection.query,
             query_embeddings=[query_embedding],
             n_results=k,
             include=["documents", "metadatas", "distances"]
@@ -64,14 +92,17 @@ class Retriever:
         if not results["documents"] or not results["documents"][0]:
             return []
 
-        for i, doc in enumerate(results["documents"][0]):
-            metadata = results["metadatas"][0][i]
-            distance = results["distances"][0][i]
-
-            # Convert distance to similarity score (ChromaDB uses L2 distance)
-            # For normalized embeddings: similarity ≈ 1 - (distance² / 4)
-            similarity = max(0, 1 - (distance ** 2) / 4)
-
+        # Convert distances to similarity scores in one vectorized pass
+        # (ChromaDB uses L2 distance). For normalized embeddings:
+        # similarity ≈ 1 - (distance² / 4)
+        distances = np.asarray(results["distances"][0], dtype=np.float32)
+        scores = np.maximum(0.0, 1.0 - (distances * distances) * 0.25)
+
+        for doc, metadata, similarity in zip(
+            results["documents"][0],
+            results["metadatas"][0],
+            scores.tolist()
+        ):
             chunks.append({
                 "text": doc,
                 "url": metadata.get("url", ""),
@@ -85,4 +116,5 @@ class Retriever:
         """Check if any retrieved chunk meets the confidence threshold."""
         if not chunks:
             return False
-        return any(chunk["score"] >= self.SIMILARITY_THRESHOLD for chunk in chunks)
+        scores = np.fromiter((chunk["score"] for chunk in chunks), dtype=np.float32, count=len(chunks))
+        return bool((scores >= self.SIMILARITY_THRESHOLD).any())
@@ -1,92 +1,183 @@
 """Web scraper for UW-Parkside website."""
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, AsyncIterator, Tuple, Optional
 import argparse
-import json
-import time
+import asyncio
+from functools import lru_cache
 from pathlib import Path
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlsplit
 from urllib.robotparser import RobotFileParser
 import httpx
+import orjson
 import trafilatura
-from collections import deque
+from lxml import html as lxml_html
+
+
+@lru_cache(maxsize=8192)
+def _normalize_url(url: str) -> str:
+    """Strip the fragment and trailing slashes (cached; links repeat a lot)."""
+    # Remove fragment
+    normalized = url.partition("#")[0]
+    # Remove trailing slash for consistency
+    if normalized.endswith("/") and normalized.count("/") > 3:
+        normalized = normalized.rstrip("/")
+    return normalized
+
+
+@lru_cache(maxsize=16)
+def _html_parser(encoding: str) -> lxml_html.HTMLParser:
+    """Shared parser decoding bytes as `encoding` (one per charset)."""
+    # Skipping the ID table speeds up parsing
+    return lxml_html.HTMLParser(collect_ids=False, encoding=encoding)
 
 
 class UWPScraper:
     """Scraper for UW-Parkside website content."""
 
-    def __init__(self, max_pages: int = 600, throttle_ms: int = 350):
+    PAGE_QUEUE_SIZE = 256  # scraped pages buffered ahead of the consumer
+
+    def __init__(self, max_pages: int = 600, throttle_ms: int = 350, concurrency: int = 8):
         self.max_pages = max_pages
         self.throttle_s = throttle_ms / 1000.0
-        self.visited_urls = set()
+        self.concurrency = concurrency
+        self._next_request_at: Dict[str, float] = {}  # host -> earliest next request start (loop time)
+        self.seen_urls = set()  # every URL ever queued, for enqueue-time dedup
+        self.pages_scraped = 0
         self.robots_parser = RobotFileParser()
-        self.client = httpx.Client(timeout=30.0, follow_redirects=True)
-
-    def setup_robots(self, base_url: str) -> None:
+        # Disallowed path prefixes for "User-agent: *"; None means the rules
+        # need RobotFileParser's ordered matching (see setup_robots)
+        self._disallowed: Optional[Tuple[str, ...]] = ()
+        self._robots_can_fetch = lru_cache(maxsize=4096)(self._robots_parser_can_fetch)
+        # Shared parser for already-decoded text; skipping the ID table
+        # speeds up parsing
+        self.html_parser = lxml_html.HTMLParser(collect_ids=False)
+        # One pooled HTTP/2 client: workers share keep-alive connections
+        # instead of paying a TLS handshake per page
+        self.client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            timeout=30.0,
+            follow_redirects=True
+        )
+
+    async def setup_robots(self, base_url: str) -> None:
         """Fetch and parse robots.txt."""
         robots_url = urljoin(base_url, "/robots.txt")
         try:
-            resp = self.client.get(robots_url)
+            resp = await self.client.get(robots_url)
             if resp.status_code == 200:
                 self.robots_parser.parse(resp.text.splitlines())
+                self._disallowed = self._disallowed_prefixes()
+                self._robots_can_fetch.cache_clear()
                 print(f"✓ Loaded robots.txt from {robots_url}")
             else:
                 print(f"⚠ No robots.txt found at {robots_url}, proceeding without restrictions")
         except Exception as e:
             print(f"⚠ Error fetching robots.txt: {e}")
 
+    def _disallowed_prefixes(self) -> Optional[Tuple[str, ...]]:
+        """Collect Disallow prefixes that apply to "User-agent: *".
+
+        Returns:
+            Tuple of path prefixes, or None if the group also has Allow rules
+            (first-match ordering then matters, so the full parser is used)
+        """
+        entry = self.robots_parser.default_entry
+        if entry is None:
+            return ()
+        if any(line.allowance for line in entry.rulelines):
+            return None
+        return tuple(line.path for line in entry.rulelines)
+
+    def _robots_parser_can_fetch(self, url: str) -> bool:
+        """Full RobotFileParser check (memoized per URL in __init__)."""
+        return self.robots_parser.can_fetch("*", url)
+
     def can_fetch(self, url: str) -> bool:
         """Check if URL is allowed by robots.txt."""
-        return self.robots_parser.can_fetch("*", url)
+        if self._disallowed is None:
+            return self._robots_can_fetch(url)
+
+        # Path (plus query) of an absolute URL, as robots rules match on it
+        path_start = url.find("/", url.find("://") + 3)
+        path = url[path_start:] if path_start != -1 else "/"
+        return not path.startswith(self._disallowed)
 
     def is_valid_uwp_url(self, url: str) -> bool:
         """Check if URL belongs to uwp.edu domain."""
-        parsed = urlparse(url)
-        return "uwp.edu" in parsed.netloc
+        if not url.startswith(("http://", "https://")):
+            return False
+        # "scheme:", "", netloc, rest
+        parts = url.split("/", 3)
+        return len(parts) > 2 and "uwp.edu" in parts[2]
 
     def normalize_url(self, url: str) -> str:
         """Normalize URL by removing fragments and trailing slashes."""
-        parsed = urlparse(url)
-        # Remove fragment
-        normalized = parsed._replace(fragment="").geturl()
-        # Remove trailing slash for consistency
-        if normalized.endswith("/") and normalized.count("/") > 3:
-            normalized = normalized.rstrip("/")
-        return normalized
+        return _normalize_url(url)
 
     def extract_links(self, html: str, base_url: str) -> set[str]:
         """Extract all valid links from HTML content."""
-        links = set()
         try:
-            from trafilatura import extract
-            from lxml import html as lxml_html
-
-            tree = lxml_html.fromstring(html)
-            for element in tree.xpath("//a[@href]"):
-                href = element.get("href")
-                if href:
-                    absolute_url = urljoin(base_url, href)
-                    normalized = self.normalize_url(absolute_url)
-                    if self.is_valid_uwp_url(normalized):
-                        links.add(normalized)
+            tree = lxml_html.fromstring(html, parser=self.html_parser)
+            return self.extract_links_from_tree(tree, base_url)
         except Exception as e:
             print(f"  Error extracting links: {e}")
+            return set()
+
+    def extract_links_from_tree(self, tree, base_url: str) -> set[str]:
+        """Extract all valid links from an already-parsed lxml tree."""
+        links = set()
+        for href in tree.xpath("//a/@href"):
+            if href:
+                absolute_url = urljoin(base_url, href)
+                normalized = self.normalize_url(absolute_url)
+                if self.is_valid_uwp_url(normalized):
+                    links.add(normalized)
 
         return links
 
-    def scrape_page(self, url: str) -> Optional[dict]:
+    async def _wait_for_host(self, url: str) -> None:
+        """Wait for the host's next request slot (``throttle_s`` apart, shared by all workers)."""
+        host = urlsplit(url).netloc
+        now = asyncio.get_running_loop().time()
+        # Reserve a slot before sleeping; no await in between, so
+        # concurrent workers always get distinct slots
+        start = max(now, self._next_request_at.get(host, now))
+        self._next_request_at[host] = start + self.throttle_s
+        await asyncio.sleep(start - now)
+
+    async def scrape_page(self, url: str) -> Optional[Tuple[dict, set[str]]]:
         """Scrape a single page and extract clean text.
 
         Returns:
-            Dict with url, title, text or None if failed/invalid
+            Tuple of (page dict with url, title, text; links found on the
+            page) or None if failed/invalid
         """
         try:
-            resp = self.client.get(url, headers={"User-Agent": "UWP-RAG-Bot/1.0"})
+            await self._wait_for_host(url)
+            resp = await self.client.get(url, headers={"User-Agent": "UWP-RAG-Bot/1.0"})
             if resp.status_code != 200:
                 return None
 
-            # Extract clean text with trafilatura
+            # Parse raw bytes once; the tree feeds title, links and trafilatura.
+            # Decode with the HTTP charset (UTF-8 if the header has none, as
+            # resp.text would), since lxml alone only looks for a <meta> one
+            try:
+                tree = lxml_html.fromstring(resp.content, parser=_html_parser(resp.encoding))
+            except LookupError:
+                # Charset Python knows but libxml2 doesn't
+                tree = lxml_html.fromstring(resp.text, parser=self.html_parser)
+            title_elements = tree.xpath("//title/text()")
+            title = title_elements[0].strip() if title_elements else None
+
+            try:
+                links = self.extract_links_from_tree(tree, url)
+            except Exception as e:
+                print(f"  Error extracting links: {e}")
+                links = set()
+
+            # Extract clean text with trafilatura (last, as it may prune the tree)
             extracted = trafilatura.extract(
-                resp.text,
+                tree,
                 include_links=False,
                 include_images=False,
                 include_tables=True,
@@ -96,92 +187,146 @@ class UWPScraper:
             if not extracted or len(extracted.split()) < 80:
                 return None
 
-            # Extract title
-            from lxml import html as lxml_html
-            tree = lxml_html.fromstring(resp.text)
-            title_elements = tree.xpath("//title/text()")
-            title = title_elements[0].strip() if title_elements else None
-
-            return {
+            page_data = {
                 "url": url,
                 "title": title,
                 "text": extracted
             }
+            return page_data, links
 
         except Exception as e:
             print(f"  Error scraping {url}: {e}")
             return None
 
-    def scrape(self, seed_url: str = "https://www.uwp.edu/") -> List[dict]:
-        """Crawl UW-Parkside website starting from seed URL.
+    async def crawl_url(self, url: str, queue: asyncio.Queue, pages: asyncio.Queue) -> None:
+        """Scrape one queued URL, emit the page and enqueue the links it contains."""
+        # Check robots.txt
+        if not self.can_fetch(url):
+            print(f"✗ Disallowed by robots.txt: {url}")
+            return
 
-        Args:
-            seed_url: Starting URL for crawl
+        print(f"[{self.pages_scraped+1}/{self.max_pages}] Scraping: {url}")
 
-        Returns:
-            List of scraped page dicts
-        """
-        print(f"Starting scrape of {seed_url}")
-        print(f"Max pages: {self.max_pages}, Throttle: {self.throttle_s}s\n")
+        # Scrape page
+        scraped = await self.scrape_page(url)
 
-        # Setup robots.txt
-        self.setup_robots(seed_url)
+        if scraped and self.pages_scraped < self.max_pages:
+            page_data, links = scraped
+            self.pages_scraped += 1
+            await pages.put(page_data)
 
-        # BFS crawl
-        queue = deque([self.normalize_url(seed_url)])
-        results = []
+            # Queue links for further crawling
+            for link in links:
+                if link not in self.seen_urls:
+                    self.seen_urls.add(link)
+                    queue.put_nowait(link)
 
-        while queue and len(results) < self.max_pages:
-            url = queue.popleft()
+    async def _crawl(self, seed_url: str, pages: asyncio.Queue) -> None:
+        """Run the concurrent BFS crawl, putting scraped pages on ``pages``."""
+        # Setup robots.txt
+        await self.setup_robots(seed_url)
 
-            # Skip if already visited
-            if url in self.visited_urls:
-                continue
+        queue: asyncio.Queue = asyncio.Queue()
+        seed = self.normalize_url(seed_url)
+        self.seen_urls.add(seed)
+        queue.put_nowait(seed)
+        max_reached = asyncio.Event()
 
-            # Check robots.txt
-            if not self.can_fetch(url):
-                print(f"✗ Disallowed by robots.txt: {url}")
-                self.visited_urls.add(url)
-                continue
+        async def worker() -> None:
+            while True:
+                url = await queue.get()
+                try:
+                    await self.crawl_url(url, queue, pages)
+                    if self.pages_scraped >= self.max_pages:
+                        max_reached.set()
+                finally:
+                    queue.task_done()
 
-            self.visited_urls.add(url)
-            print(f"[{len(results)+1}/{self.max_pages}] Scraping: {url}")
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        drained = asyncio.create_task(queue.join())
+        stopped = asyncio.create_task(max_reached.wait())
 
-            # Scrape page
-            page_data = self.scrape_page(url)
+        try:
+            # Stop when the frontier is exhausted or enough pages are collected
+            await asyncio.wait({drained, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (*workers, drained, stopped):
+                task.cancel()
+            await asyncio.gather(*workers, drained, stopped, return_exceptions=True)
+
+    async def scrape_stream(self, seed_url: str = "https://www.uwp.edu/") -> AsyncIterator[dict]:
+        """Crawl UW-Parkside website, yielding pages as they are scraped.
+
+        Up to ``concurrency`` workers fetch pages at once, but request starts
+        to a host are spaced ``throttle_s`` apart across all of them, so
+        concurrency only overlaps slow responses. Pages pass through a bounded
+        queue, so a slow consumer (e.g. the indexer) applies backpressure to
+        the crawl instead of pages piling up in memory.
 
-            if page_data:
-                results.append(page_data)
+        Args:
+            seed_url: Starting URL for crawl
 
-                # Extract links for further crawling
+        Yields:
+            Scraped page dicts
+        """
+        print(f"Starting scrape of {seed_url}")
+        print(f"Max pages: {self.max_pages}, Throttle: {self.throttle_s}s, Concurrency: {self.concurrency}\n")
+
+        pages: asyncio.Queue = asyncio.Queue(maxsize=self.PAGE_QUEUE_SIZE)
+        crawl_done = asyncio.Event()
+        self.pages_scraped = 0
+
+        async def crawl() -> None:
+            try:
+                await self._crawl(seed_url, pages)
+            finally:
+                # Never wait for queue room here: the consumer may be gone.
+                # If the queue is full, the consumer sees crawl_done once
+                # it has drained it.
+                crawl_done.set()
                 try:
-                    resp = self.client.get(url)
-                    links = self.extract_links(resp.text, url)
-                    for link in links:
-                        if link not in self.visited_urls:
-                            queue.append(link)
-                except:
+                    pages.put_nowait(None)
+                except asyncio.QueueFull:
                     pass
 
-            # Throttle
-            time.sleep(self.throttle_s)
+        crawler = asyncio.create_task(crawl())
+        try:
+            while not (crawl_done.is_set() and pages.empty()):
+                page = await pages.get()
+                if page is None:
+                    break
+                yield page
+            await crawler  # Surface crawl errors
+        finally:
+            crawler.cancel()
+            await asyncio.gather(crawler, return_exceptions=True)
+
+        print(f"\n✓ Scraping complete: {self.pages_scraped} pages")
+
+    async def scrape(self, seed_url: str = "https://www.uwp.edu/") -> List[dict]:
+        """Crawl UW-Parkside website starting from seed URL.
+
+        Args:
+            seed_url: Starting URL for crawl
 
-        print(f"\n✓ Scraping complete: {len(results)} pages")
-        return results
+        Returns:
+            List of scraped page dicts
+        """
+        return [page async for page in self.scrape_stream(seed_url)]
 
     def save_to_jsonl(self, data: List[dict], output_path: Path) -> None:
         """Save scraped data to JSONL file."""
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(output_path, "w", encoding="utf-8") as f:
+        with open(output_path, "wb") as f:
             for item in data:
-                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+                f.write(orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE))
 
         print(f"✓ Saved {len(data)} pages to {output_path}")
 
-    def close(self):
+    async def close(self):
         """Close HTTP client."""
-        self.client.close()
+        await self.client.aclose()
 
 
 def main():
@@ -209,11 +354,15 @@ def main():
     args = parser.parse_args()
 
     scraper = UWPScraper(max_pages=args.max_pages)
-    try:
-        data = scraper.scrape(seed_url=args.seed_url)
-        scraper.save_to_jsonl(data, args.output)
-    finally:
-        scraper.close()
+
+    async def run() -> List[dict]:
+        try:
+            return await scraper.scrape(seed_url=args.seed_url)
+        finally:
+            await scraper.close()
+
+    data = asyncio.run(run())
+    scraper.save_to_jsonl(data, args.output)
 
 
 if __name__ == "__main__":
@@ -1,22 +1,80 @@
 """Ask endpoint for RAG question-answering."""
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+import orjson
 from fastapi import APIRouter, Depends, HTTPException
-from openai import OpenAI
-from chromadb import PersistentClient
+from fastapi.responses import StreamingResponse
+from openai import AsyncOpenAI
 
 from app.models import AskRequest, AskResponse, Source
-from app.deps import get_settings, get_chroma_client
+from app.deps import get_settings, get_openai_client, get_retriever
 from app.settings import Settings
-from app.rag.retriever import Retriever
-from app.rag.prompts import SYSTEM_PROMPT, build_user_message
+from app.rag.retriever import Retriever, normalize_query
+from app.rag.prompts import SYSTEM_PROMPT, PROMPT_CACHE_KEY, build_user_message
 
 router = APIRouter()
 
+# Identical on every request, so built once and shared
+_SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+NO_MATCH_ANSWER = "I don't have a reliable source to answer that question. Please try rephrasing or ask about UW-Parkside programs, admissions, campus life, or academics."
+
+# Answers to recent questions, keyed by (question with case and whitespace
+# normalized, k, index version); punctuation is significant
+ANSWER_CACHE_SIZE = 1024
+_ANSWER_CACHE: OrderedDict = OrderedDict()
+
+
+def _index_version(chroma_path: str) -> Tuple[Optional[int], ...]:
+    """Version the index by the mtimes of Chroma's SQLite file and its WAL.
+
+    Any ingest write touches one of them (WAL mode writes to the -wal file
+    until a checkpoint), so cached answers are dropped once the index changes.
+    """
+    version = []
+    for name in ("chroma.sqlite3", "chroma.sqlite3-wal"):
+        try:
+            version.append((Path(chroma_path) / name).stat().st_mtime_ns)
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+def _build_messages(question: str, chunks: List[dict]) -> List[dict]:
+    """Build the chat messages for a question and its retrieved chunks."""
+    chunks_with_meta = [(chunk["text"], {"url": chunk["url"], "title": chunk["title"]}) for chunk in chunks]
+    user_message = build_user_message(question, chunks_with_meta)
+    return [_SYSTEM_MSG, {"role": "user", "content": user_message}]
+
+
+def _unique_sources(chunks: List[dict]) -> List[Source]:
+    """Extract unique sources in one pass (dicts keep first-seen order)."""
+    unique_sources = {}
+    for chunk in chunks:
+        unique_sources.setdefault(chunk["url"], chunk["title"])
+    return [Source(url=url, title=title) for url, title in unique_sources.items()]
+
+
+# Sent on every event stream so proxies treat all of them alike
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # nginx would otherwise buffer the stream
+}
+
+
+def _sse(data: dict, event: Optional[str] = None) -> bytes:
+    """Format one Server-Sent Event."""
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
 
 @router.post("/ask", response_model=AskResponse)
 async def ask_question(
     request: AskRequest,
     settings: Settings = Depends(get_settings),
-    chroma_client: PersistentClient = Depends(get_chroma_client)
+    openai_client: AsyncOpenAI = Depends(get_openai_client),
+    retriever: Retriever = Depends(get_retriever)
 ):
     """Answer a question using RAG.
 
@@ -26,39 +84,27 @@ async def ask_question(
     Returns:
         Answer with citations and sources
     """
-    # Initialize OpenAI client
-    openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-    # Initialize retriever
-    retriever = Retriever(
-        chroma_client=chroma_client,
-        openai_client=openai_client,
-        embed_model=settings.OPENAI_EMBED_MODEL
-    )
+    # Repeated questions against an unchanged index reuse the previous answer
+    cache_key = (normalize_query(request.question), request.k, _index_version(settings.CHROMA_PATH))
+    cached = _ANSWER_CACHE.get(cache_key)
+    if cached is not None:
+        _ANSWER_CACHE.move_to_end(cache_key)
+        return cached
 
     # Retrieve relevant chunks
-    chunks = retriever.query(request.question, k=request.k)
+    chunks = await retriever.query(request.question, k=request.k)
 
     # Check if we have confident matches
     if not retriever.has_confident_match(chunks):
-        return AskResponse(
-            answer="I don't have a reliable source to answer that question. Please try rephrasing or ask about UW-Parkside programs, admissions, campus life, or academics.",
-            sources=[]
-        )
-
-    # Build prompt
-    chunks_with_meta = [(chunk["text"], {"url": chunk["url"], "title": chunk["title"]}) for chunk in chunks]
-    user_message = build_user_message(request.question, chunks_with_meta)
+        return AskResponse(answer=NO_MATCH_ANSWER, sources=[])
 
     # Call OpenAI Chat Completions
     try:
-        response = openai_client.chat.completions.create(
+        response = await openai_client.chat.completions.create(
             model=settings.OPENAI_CHAT_MODEL,
             temperature=0.2,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_message}
-            ]
+            messages=_build_messages(request.question, chunks),
+            extra_body={"prompt_cache_key": PROMPT_CACHE_KEY}
         )
 
         answer = response.choices[0].message.content
@@ -66,19 +112,71 @@ async def ask_question(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
 
-    # Extract unique sources
-    seen_urls = set()
-    sources = []
-
-    for chunk in chunks:
-        if chunk["url"] not in seen_urls:
-            seen_urls.add(chunk["url"])
-            sources.append(Source(
-                url=chunk["url"],
-                title=chunk["title"]
-            ))
-
-    return AskResponse(
+    result = AskResponse(
         answer=answer,
-        sources=sources
+        sources=_unique_sources(chunks)
     )
+
+    _ANSWER_CACHE[cache_key] = result
+    if len(_ANSWER_CACHE) > ANSWER_CACHE_SIZE:
+        _ANSWER_CACHE.popitem(last=False)
+
+    return result
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(
+    request: AskRequest,
+    settings: Settings = Depends(get_settings),
+    openai_client: AsyncOpenAI = Depends(get_openai_client),
+    retriever: Retriever = Depends(get_retriever)
+):
+    """Answer a question using RAG, streaming the answer as Server-Sent Events.
+
+    The answer arrives as ``data: {"delta": ...}`` events while it is being
+    generated, followed by a single ``sources`` event.
+
+    Args:
+        request: Question and parameters
+
+    Returns:
+        text/event-stream response
+    """
+    # Retrieve relevant chunks
+    chunks = await retriever.query(request.question, k=request.k)
+
+    if not retriever.has_confident_match(chunks):
+        async def no_match() -> AsyncIterator[bytes]:
+            yield _sse({"delta": NO_MATCH_ANSWER})
+            yield _sse({"sources": []}, event="sources")
+
+        return StreamingResponse(no_match(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+    # Open the stream before responding so request errors still return a 500
+    try:
+        stream = await openai_client.chat.completions.create(
+            model=settings.OPENAI_CHAT_MODEL,
+            temperature=0.2,
+            messages=_build_messages(request.question, chunks),
+            extra_body={"prompt_cache_key": PROMPT_CACHE_KEY},
+            stream=True
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
+
+    sources = [source.model_dump() for source in _unique_sources(chunks)]
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield _sse({"delta": chunk.choices[0].delta.content})
+        except Exception as e:
+            yield _sse({"detail": f"OpenAI API error: {str(e)}"}, event="error")
+            return
+        finally:
+            await stream.close()  # Also on client disconnect
+
+        yield _sse({"sources": sources}, event="sources")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=_SSE_HEADERS)
@@ -1,38 +1,31 @@
 """Health check endpoint."""
 from fastapi import APIRouter, Depends
-from chromadb import PersistentClient
+from chromadb import Collection
 
-from app.deps import get_chroma_client, get_settings
+from app.models import HealthResponse
+from app.deps import get_collection, get_settings
 from app.settings import Settings
 
 router = APIRouter()
 
 
-@router.get("/health")
+@router.get("/health", response_model=HealthResponse)
 async def health_check(
     settings: Settings = Depends(get_settings),
-    chroma_client: PersistentClient = Depends(get_chroma_client)
+    collection: Collection = Depends(get_collection)
 ):
     """Health check endpoint.
 
     Returns:
         Basic health status and configuration info
     """
-    # Check if collection exists
-    collection_exists = False
-    chunk_count = 0
+    # Collection is created at startup; report whether it has been populated
+    chunk_count = collection.count()
 
-    try:
-        collection = chroma_client.get_collection(name="uwp")
-        collection_exists = True
-        chunk_count = collection.count()
-    except:
-        pass
-
-    return {
-        "status": "healthy",
-        "embed_model": settings.OPENAI_EMBED_MODEL,
-        "chat_model": settings.OPENAI_CHAT_MODEL,
-        "collection_exists": collection_exists,
-        "chunk_count": chunk_count
-    }
+    return HealthResponse(
+        status="healthy",
+        embed_model=settings.OPENAI_EMBED_MODEL,
+        chat_model=settings.OPENAI_CHAT_MODEL,
+        collection_exists=chunk_count > 0,
+        chunk_count=chunk_count
+    )
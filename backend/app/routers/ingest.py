@@ -1,12 +1,16 @@
 """Ingestion endpoints for scraping and indexing."""
 import asyncio
-import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from typing import Callable, Optional
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
 
 from app.models import IngestStartRequest, IngestStatus
-from app.deps import get_settings
+from app.deps import get_settings, open_index
 from app.settings import Settings
 from app.rag.scrape_uwp import UWPScraper
 from app.rag.build_index import IndexBuilder
@@ -16,65 +20,135 @@ router = APIRouter()
 STATUS_FILE = Path("data/ingest_status.json")
 
 
-def load_status() -> IngestStatus:
-    """Load ingest status from file."""
-    if not STATUS_FILE.exists():
+# Ingest runs on one background thread with its own event loop, so the
+# crawl and embedding calls never block the API's loop. CPU-bound parsing
+# and chunking still share the GIL with the API. A process pool would
+# avoid that, but Chroma's embedded store can't safely be written by
+# another process while the API holds it open.
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+
+# Ingest currently submitted to the executor, if any
+_INGEST_FUTURE: Optional[Future] = None
+
+# Prebuilt validator/serializer for the status file
+_STATUS_ADAPTER = TypeAdapter(IngestStatus)
+
+# Last status read from disk as ((inode, mtime), status); replaced as a
+# whole so readers on the event loop never see a half-updated entry
+_STATUS_CACHE: dict = {}
+
+
+def cached_status() -> Optional[IngestStatus]:
+    """Return the status if it is known without reading the file.
+
+    Returns:
+        Idle if there is no status file, the cached status if the file is
+        unchanged since it was last read, otherwise None
+    """
+    try:
+        stat = STATUS_FILE.stat()
+    except FileNotFoundError:
         return IngestStatus(status="idle")
 
+    entry = _STATUS_CACHE.get("entry")
+    if entry is not None and entry[0] == (stat.st_ino, stat.st_mtime_ns):
+        return entry[1]
+    return None
+
+
+def load_status() -> IngestStatus:
+    """Load ingest status from file.
+
+    The parsed status is cached and reused until the file is replaced, so
+    repeated polls only cost a stat() call.
+    """
+    status = cached_status()
+    if status is not None:
+        return status
+
     try:
-        with open(STATUS_FILE, "r") as f:
-            data = json.load(f)
-            return IngestStatus(**data)
-    except:
+        stat = STATUS_FILE.stat()
+        status = _STATUS_ADAPTER.validate_json(STATUS_FILE.read_bytes())
+    except (OSError, ValidationError):
         return IngestStatus(status="idle")
 
+    _STATUS_CACHE["entry"] = ((stat.st_ino, stat.st_mtime_ns), status)
+    return status
+
+
+async def load_status_async() -> IngestStatus:
+    """Load ingest status without blocking the event loop on a file read.
+
+    An unchanged file is answered from the cache directly; only an actual
+    read is offloaded to a worker thread.
+    """
+    status = cached_status()
+    if status is None:
+        status = await asyncio.to_thread(load_status)
+    return status
+
 
 def save_status(status: IngestStatus) -> None:
-    """Save ingest status to file."""
+    """Save ingest status to file.
+
+    Writes a temp file and renames it over the old one, so readers never
+    see a partially written status.
+    """
     STATUS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(STATUS_FILE, "w") as f:
-        json.dump(status.model_dump(), f, indent=2)
+    tmp_file = STATUS_FILE.with_suffix(".json.tmp")
+    tmp_file.write_bytes(_STATUS_ADAPTER.dump_json(status, indent=2))
+    os.replace(tmp_file, STATUS_FILE)
 
 
-def run_ingest_task(max_pages: int, settings: Settings) -> None:
-    """Background task to scrape and index content.
+def run_ingest_task(
+    max_pages: int,
+    settings: Settings,
+    started_at: str,
+    on_collection_recreated: Optional[Callable[[], None]] = None
+) -> None:
+    """Scrape and index content (runs on the ingest thread).
 
     Args:
         max_pages: Maximum number of pages to scrape
         settings: Application settings
+        started_at: When the ingest was requested (status already "running")
+        on_collection_recreated: Called if a full re-index replaces the
+            collection, before any pages are indexed
     """
-    # Update status to running
-    status = IngestStatus(
-        status="running",
-        started_at=datetime.now().isoformat()
-    )
-    save_status(status)
+    status = IngestStatus(status="running", started_at=started_at)
 
     try:
-        # Step 1: Scrape
-        print(f"Starting scrape with max_pages={max_pages}")
+        # Scrape and index concurrently: pages are chunked and embedded as
+        # the crawl produces them, with no intermediate JSONL file
+        print(f"Starting scrape and index with max_pages={max_pages}")
         scraper = UWPScraper(max_pages=max_pages)
-        data_path = Path("data/uwp_docs.jsonl")
-
-        try:
-            docs = scraper.scrape()
-            scraper.save_to_jsonl(docs, data_path)
-            pages_scraped = len(docs)
-        finally:
-            scraper.close()
-
-        # Step 2: Index
-        print("Starting indexing...")
         builder = IndexBuilder(
             chroma_path=settings.CHROMA_PATH,
             embed_model=settings.OPENAI_EMBED_MODEL,
-            openai_api_key=settings.OPENAI_API_KEY
+            openai_api_key=settings.OPENAI_API_KEY,
+            add_batch_size=settings.INGEST_BATCH_SIZE,
+            embed_batch_size=settings.INGEST_EMBED_BATCH,
+            bulk_mode=settings.CHROMA_BULK_MODE,
+            embed_dimensions=settings.OPENAI_EMBED_DIMENSIONS,
+            on_collection_recreated=on_collection_recreated
         )
 
-        stats = builder.build_index(data_path, reset=True)
+        async def pipeline() -> dict:
+            pages = scraper.scrape_stream()
+            try:
+                return await builder.build_index_async(
+                    pages,
+                    reset=not settings.INGEST_INCREMENTAL
+                )
+            finally:
+                await pages.aclose()  # Stop the crawl even if indexing failed
+                await scraper.close()
+
+        stats = asyncio.run(pipeline())
         stats_path = Path("data/stats.json")
         builder.save_stats(stats, stats_path)
 
+        pages_scraped = stats["total_documents"]
         chunks_indexed = stats["total_chunks"]
 
         # Update status to done
@@ -103,31 +177,61 @@ def run_ingest_task(max_pages: int, settings: Settings) -> None:
         save_status(status)
 
 
+def _on_ingest_done(app: FastAPI, future: Future) -> None:
+    """Reopen the API's index handles and record any unhandled ingest error."""
+    try:
+        open_index(app)
+    except Exception as e:
+        print(f"Could not reopen index after ingest: {e}")
+
+    error = future.exception()
+    if error is None:
+        return
+
+    print(f"Ingest worker failed: {error}")
+    save_status(IngestStatus(
+        status="error",
+        started_at=load_status().started_at,
+        completed_at=datetime.now().isoformat(),
+        error_message=str(error)
+    ))
+
+
 @router.post("/ingest/start")
 async def start_ingest(
     request: IngestStartRequest,
-    background_tasks: BackgroundTasks,
+    http_request: Request,
     settings: Settings = Depends(get_settings)
 ):
-    """Start background ingestion task.
+    """Start ingestion on the background ingest thread.
 
     Args:
         request: Ingestion parameters
-        background_tasks: FastAPI background tasks
+        http_request: Incoming request (for the app whose index to refresh)
 
     Returns:
         Acknowledgment message
     """
+    global _INGEST_FUTURE
+
     # Check if already running
-    current_status = load_status()
-    if current_status.status == "running":
+    current_status = await load_status_async()
+    if current_status.status == "running" or (_INGEST_FUTURE and not _INGEST_FUTURE.done()):
         raise HTTPException(status_code=409, detail="Ingestion already in progress")
 
     # Determine max_pages
     max_pages = request.max_pages or settings.INGEST_MAX_PAGES
 
-    # Start background task
-    background_tasks.add_task(run_ingest_task, max_pages, settings)
+    # Mark running before submitting (no await in between), so a second
+    # request can't pass the check above while this one is starting
+    started_at = datetime.now().isoformat()
+    save_status(IngestStatus(status="running", started_at=started_at))
+
+    # If a full re-index recreates the collection, repoint the API at the new
+    # one right away instead of serving the dropped handle until it finishes
+    reopen_index = partial(open_index, http_request.app)
+    _INGEST_FUTURE = _EXECUTOR.submit(run_ingest_task, max_pages, settings, started_at, reopen_index)
+    _INGEST_FUTURE.add_done_callback(partial(_on_ingest_done, http_request.app))
 
     return {
         "message": "Ingestion started",
@@ -142,4 +246,4 @@ async def get_ingest_status():
     Returns:
         Current ingest status
     """
-    return load_status()
+    return await load_status_async()
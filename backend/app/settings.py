@@ -1,5 +1,6 @@
 """Application settings loaded from environment variables."""
-from typing import List
+from functools import cached_property
+from typing import Optional, Tuple
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
 
@@ -10,16 +11,21 @@ class Settings(BaseSettings):
     # OpenAI Configuration
     OPENAI_API_KEY: str
     OPENAI_EMBED_MODEL: str = "text-embedding-3-small"
+    OPENAI_EMBED_DIMENSIONS: Optional[int] = None  # shorten embeddings; changing it needs INGEST_INCREMENTAL=false once
     OPENAI_CHAT_MODEL: str = "gpt-4o-mini"
 
     # ChromaDB Configuration
     CHROMA_PATH: str = ".chroma"
+    CHROMA_BULK_MODE: bool = True  # use SQLite WAL for ingest writes
 
     # CORS Configuration
     ALLOWED_ORIGINS: str = "http://localhost:5173"
 
     # Ingestion Configuration
     INGEST_MAX_PAGES: int = 600
+    INGEST_BATCH_SIZE: int = 200  # chunks per ChromaDB write
+    INGEST_EMBED_BATCH: int = 128  # chunks per embeddings API request
+    INGEST_INCREMENTAL: bool = True  # only re-embed new or changed chunks
 
     # Server Configuration
     BACKEND_PORT: int = 8080
@@ -31,7 +37,7 @@ class Settings(BaseSettings):
         extra="ignore"
     )
 
-    @property
-    def allowed_origins_list(self) -> List[str]:
-        """Parse ALLOWED_ORIGINS into a list."""
-        return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
+    @cached_property
+    def allowed_origins_list(self) -> Tuple[str, ...]:
+        """Parse ALLOWED_ORIGINS into a tuple (computed once)."""
+        return tuple(origin.strip() for origin in self.ALLOWED_ORIGINS.split(","))
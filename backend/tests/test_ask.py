@@ -1,61 +1,77 @@
 """Tests for /ask endpoint."""
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock
 from fastapi.testclient import TestClient
 
 from app.main import app
 from app.models import AskRequest
+from app.deps import get_openai_client, get_retriever
+from app.routers import ask
 
 
 client = TestClient(app)
 
 
-@pytest.fixture
-def mock_retriever():
-    """Mock retriever with sample chunks."""
-    with patch("app.routers.ask.Retriever") as mock_class:
-        mock_instance = Mock()
+@pytest.fixture(scope="module", autouse=True)
+def app_lifespan():
+    """Run app startup/shutdown so shared clients exist on app.state."""
+    with client:
+        yield
 
-        # Mock high-confidence chunks
-        mock_instance.query.return_value = [
-            {
-                "text": "UW-Parkside offers business, education, and science programs.",
-                "url": "https://www.uwp.edu/academics",
-                "title": "Academics",
-                "score": 0.85
-            },
-            {
-                "text": "The university has over 4,000 students enrolled.",
-                "url": "https://www.uwp.edu/about",
-                "title": "About",
-                "score": 0.72
-            }
-        ]
 
-        mock_instance.has_confident_match.return_value = True
+@pytest.fixture(autouse=True)
+def clear_answer_cache():
+    """Start each test with an empty answer cache."""
+    ask._ANSWER_CACHE.clear()
+    yield
+    ask._ANSWER_CACHE.clear()
 
-        mock_class.return_value = mock_instance
 
-        yield mock_instance
+@pytest.fixture
+def mock_retriever():
+    """Mock retriever with sample chunks."""
+    mock_instance = Mock()
+    mock_instance.query = AsyncMock()
+
+    # Mock high-confidence chunks
+    mock_instance.query.return_value = [
+        {
+            "text": "UW-Parkside offers business, education, and science programs.",
+            "url": "https://www.uwp.edu/academics",
+            "title": "Academics",
+            "score": 0.85
+        },
+        {
+            "text": "The university has over 4,000 students enrolled.",
+            "url": "https://www.uwp.edu/about",
+            "title": "About",
+            "score": 0.72
+        }
+    ]
+
+    mock_instance.has_confident_match.return_value = True
+
+    app.dependency_overrides[get_retriever] = lambda: mock_instance
+    yield mock_instance
+    app.dependency_overrides.pop(get_retriever, None)
 
 
 @pytest.fixture
 def mock_openai():
     """Mock OpenAI client."""
-    with patch("app.routers.ask.OpenAI") as mock_class:
-        mock_instance = Mock()
+    mock_instance = Mock()
 
-        # Mock chat completion response
-        mock_response = Mock()
-        mock_response.choices = [
-            Mock(message=Mock(content="UW-Parkside offers undergraduate and graduate programs in business, education, and sciences [1]. The university serves over 4,000 students [2]."))
-        ]
+    # Mock chat completion response
+    mock_response = Mock()
+    mock_response.choices = [
+        Mock(message=Mock(content="UW-Parkside offers undergraduate and graduate programs in business, education, and sciences [1]. The university serves over 4,000 students [2]."))
+    ]
 
-        mock_instance.chat.completions.create.return_value = mock_response
+    mock_instance.chat.completions.create = AsyncMock(return_value=mock_response)
 
-        mock_class.return_value = mock_instance
-
-        yield mock_instance
+    app.dependency_overrides[get_openai_client] = lambda: mock_instance
+    yield mock_instance
+    app.dependency_overrides.pop(get_openai_client, None)
 
 
 def test_ask_endpoint_success(mock_retriever, mock_openai):
@@ -82,33 +98,36 @@ def test_ask_endpoint_success(mock_retriever, mock_openai):
 
 def test_ask_endpoint_low_confidence(mock_openai):
     """Test guardrail when no confident matches found."""
-    with patch("app.routers.ask.Retriever") as mock_class:
-        mock_instance = Mock()
-
-        # Mock low-confidence chunks
-        mock_instance.query.return_value = [
-            {
-                "text": "Some unrelated text",
-                "url": "https://example.com",
-                "title": "Example",
-                "score": 0.1
-            }
-        ]
-
-        mock_instance.has_confident_match.return_value = False
-        mock_class.return_value = mock_instance
-
+    mock_instance = Mock()
+    mock_instance.query = AsyncMock()
+
+    # Mock low-confidence chunks
+    mock_instance.query.return_value = [
+        {
+            "text": "Some unrelated text",
+            "url": "https://example.com",
+            "title": "Example",
+            "score": 0.1
+        }
+    ]
+
+    mock_instance.has_confident_match.return_value = False
+    app.dependency_overrides[get_retriever] = lambda: mock_instance
+
+    try:
         response = client.post(
             "/ask",
             json={"question": "What is quantum physics?", "k": 5}
         )
+    finally:
+        app.dependency_overrides.pop(get_retriever, None)
 
-        assert response.status_code == 200
-        data = response.json()
+    assert response.status_code == 200
+    data = response.json()
 
-        # Should return "don't know" message
-        assert "don't have a reliable source" in data["answer"].lower()
-        assert len(data["sources"]) == 0
+    # Should return "don't know" message
+    assert "don't have a reliable source" in data["answer"].lower()
+    assert len(data["sources"]) == 0
 
 
 def test_ask_endpoint_validation():
@@ -154,3 +173,79 @@ def test_ask_citation_format(mock_retriever, mock_openai):
     system_message = next(m for m in messages if m["role"] == "system")
     assert "cite" in system_message["content"].lower()
     assert "[1]" in system_message["content"] or "bracketed" in system_message["content"].lower()
+
+
+def test_ask_stream_endpoint(mock_retriever, mock_openai):
+    """Test streamed answer deltas followed by a sources event."""
+    class FakeStream:
+        close = AsyncMock()
+
+        async def __aiter__(self):
+            for text in ["UW-Parkside offers ", None, "many programs [1]."]:
+                yield Mock(choices=[Mock(delta=Mock(content=text))])
+
+    stream = FakeStream()
+    mock_openai.chat.completions.create = AsyncMock(return_value=stream)
+
+    response = client.post(
+        "/ask/stream",
+        json={"question": "What programs does UW-Parkside offer?", "k": 5}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.headers["x-accel-buffering"] == "no"
+    assert mock_openai.chat.completions.create.call_args.kwargs["stream"] is True
+    stream.close.assert_awaited_once()
+
+    events = [block for block in response.text.split("\n\n") if block]
+    assert events[:2] == [
+        'data: {"delta":"UW-Parkside offers "}',
+        'data: {"delta":"many programs [1]."}'
+    ]
+    assert events[2].startswith("event: sources\ndata: ")
+    assert "https://www.uwp.edu/academics" in events[2]
+
+
+def test_ask_caches_repeated_questions(mock_retriever, mock_openai):
+    """Test that a repeated question is answered from the cache."""
+    first = client.post("/ask", json={"question": "What programs are offered?", "k": 5})
+    second = client.post("/ask", json={"question": "  what programs are   OFFERED?", "k": 5})
+
+    assert first.status_code == 200
+    assert second.json() == first.json()
+    mock_retriever.query.assert_called_once()
+    mock_openai.chat.completions.create.assert_called_once()
+
+    # A different k is a different cache entry
+    client.post("/ask", json={"question": "What programs are offered?", "k": 3})
+    assert mock_openai.chat.completions.create.call_count == 2
+
+
+def test_ask_cache_distinguishes_punctuation(mock_retriever, mock_openai):
+    """Test that questions differing only in punctuation get their own answers."""
+    for question in ["Does UWP offer C++ courses?", "Does UWP offer C# courses?",
+                     "Is a 2.5 GPA enough?", "Is a 25 GPA enough?"]:
+        assert client.post("/ask", json={"question": question, "k": 5}).status_code == 200
+
+    assert mock_openai.chat.completions.create.call_count == 4
+
+
+def test_ask_stream_low_confidence():
+    """Test that the low-confidence stream sends the fallback with stream headers."""
+    mock_instance = Mock()
+    mock_instance.query = AsyncMock(return_value=[])
+    mock_instance.has_confident_match.return_value = False
+    app.dependency_overrides[get_retriever] = lambda: mock_instance
+
+    try:
+        response = client.post("/ask/stream", json={"question": "What is quantum physics?", "k": 5})
+    finally:
+        app.dependency_overrides.pop(get_retriever, None)
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.headers["x-accel-buffering"] == "no"
+    assert "reliable source" in response.text
+    assert response.text.rstrip().endswith('event: sources\ndata: {"sources":[]}')
@@ -0,0 +1,272 @@
+"""Tests for index building."""
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import chromadb
+import pytest
+
+from app.rag import build_index
+from app.rag.build_index import IndexBuilder
+from app.rag.retriever import Retriever
+from app.rag.scrape_uwp import UWPScraper
+from app.routers import ingest
+from app.settings import Settings
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer standing in for tiktoken (no encoding download)."""
+
+    def __init__(self):
+        self.vocab = {}
+        self.words = []
+
+    def encode(self, text):
+        tokens = []
+        for word in text.split(" "):
+            if word not in self.vocab:
+                self.vocab[word] = len(self.words)
+                self.words.append(word)
+            tokens.append(self.vocab[word])
+        return tokens
+
+    def encode_batch(self, texts, num_threads=1):
+        return [self.encode(text) for text in texts]
+
+    def decode_batch(self, batches, num_threads=1):
+        return [" ".join(self.words[token] for token in tokens) for tokens in batches]
+
+
+def fake_embedding(text, dim=8):
+    """Deterministic embedding derived from the text."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [byte / 255.0 for byte in digest[:dim]]
+
+
+class FakeEmbeddings:
+    """Records embedded texts; honors the `dimensions` parameter."""
+
+    def __init__(self):
+        self.texts = []
+
+    async def create(self, model, input, dimensions=None, **kwargs):
+        self.texts.extend(input)
+        dim = dimensions if isinstance(dimensions, int) else 8
+        return SimpleNamespace(
+            data=[SimpleNamespace(embedding=fake_embedding(text, dim)) for text in input]
+        )
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """Patch the builder's tokenizer and OpenAI client with fakes."""
+    embeddings = FakeEmbeddings()
+
+    class FakeAsyncOpenAI:
+        def __init__(self, *args, **kwargs):
+            self.embeddings = embeddings
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return None
+
+    monkeypatch.setattr(build_index.tiktoken, "get_encoding", lambda name: FakeTokenizer())
+    monkeypatch.setattr(build_index, "AsyncOpenAI", FakeAsyncOpenAI)
+    return embeddings
+
+
+@pytest.fixture
+def builder(tmp_path, fake_embeddings):
+    """Index builder over a temporary Chroma directory."""
+    return IndexBuilder(chroma_path=str(tmp_path / "chroma"), openai_api_key="test-key")
+
+
+def make_docs(count, changed=(), titles=None):
+    """Pages with multi-chunk text; pages in `changed` get different text."""
+    titles = titles or {}
+    docs = []
+    for i in range(count):
+        text = f"page{i} " * (IndexBuilder.CHUNK_SIZE + 50)
+        if i in changed:
+            text += "updated"
+        docs.append({"url": f"https://www.uwp.edu/p{i}", "title": titles.get(i, f"Page {i}"), "text": text})
+    return docs
+
+
+def run_build(builder, docs, reset):
+    """Run build_index_async over an async stream of docs."""
+    async def stream():
+        for doc in docs:
+            yield doc
+
+    return asyncio.run(builder.build_index_async(stream(), reset=reset))
+
+
+async def test_query_after_ingest_on_worker_thread(builder, tmp_path):
+    """Test that a handle opened before an ingest sees the ingest's writes."""
+    # Long-lived handle, as opened by the API at startup
+    handle = chromadb.PersistentClient(path=str(tmp_path / "chroma")).get_or_create_collection(
+        name=Retriever.COLLECTION_NAME,
+        metadata=build_index.collection_metadata(builder.embed_model)
+    )
+    handle.add(
+        ids=["old"],
+        embeddings=[fake_embedding("old")],
+        documents=["old"],
+        metadatas=[{"url": "https://www.uwp.edu/old", "title": "Old"}]
+    )
+
+    # Re-ingest on the ingest thread, the way start_ingest runs it
+    await asyncio.get_running_loop().run_in_executor(
+        ingest._EXECUTOR, run_build, builder, make_docs(3), True
+    )
+
+    openai_client = AsyncMock()
+    openai_client.embeddings.create.return_value = SimpleNamespace(
+        data=[SimpleNamespace(embedding=fake_embedding("question"))]
+    )
+    retriever = Retriever(collection=handle, openai_client=openai_client)
+
+    results = await retriever.query("Which pages exist?", k=10)
+
+    assert handle.count() == 6
+    assert {result["url"] for result in results} == {f"https://www.uwp.edu/p{i}" for i in range(3)}
+    assert all(result["text"] for result in results)
+
+
+def test_reset_rebuilds_collection_for_new_dimensions(builder, tmp_path):
+    """Test that a full re-index after a dimensions change recreates the collection."""
+    recreated = []
+    builder.on_collection_recreated = lambda: recreated.append(None)
+    run_build(builder, make_docs(2), reset=True)
+    assert recreated == []  # Same settings: cleared in place
+
+    # Handle reopened by the callback, as the API does via open_index
+    handles = []
+    resized = IndexBuilder(
+        chroma_path=str(tmp_path / "chroma"),
+        openai_api_key="test-key",
+        embed_dimensions=4,
+        on_collection_recreated=lambda: handles.append(
+            chromadb.PersistentClient(path=str(tmp_path / "chroma")).get_collection(IndexBuilder.COLLECTION_NAME)
+        )
+    )
+    stats = run_build(resized, make_docs(2), reset=True)
+
+    collection = resized.chroma_client.get_collection(IndexBuilder.COLLECTION_NAME)
+    assert stats["total_chunks"] == collection.count() == 4
+    assert len(handles) == 1 and handles[0].count() == 4
+    assert collection.metadata["embed_dimensions"] == 4
+    assert len(collection.get(limit=1, include=["embeddings"])["embeddings"][0]) == 4
+
+
+def test_incremental_refuses_new_dimensions(builder, tmp_path):
+    """Test that an incremental update with changed dimensions fails clearly."""
+    run_build(builder, make_docs(2), reset=True)
+
+    resized = IndexBuilder(chroma_path=str(tmp_path / "chroma"), openai_api_key="test-key", embed_dimensions=4)
+    with pytest.raises(ValueError, match="INGEST_INCREMENTAL=false"):
+        run_build(resized, make_docs(2), reset=False)
+
+
+def test_incremental_adopts_unversioned_collection(builder):
+    """Test that a collection created before settings were recorded is stamped."""
+    builder.chroma_client.create_collection(name=IndexBuilder.COLLECTION_NAME)
+
+    run_build(builder, make_docs(1), reset=False)
+
+    collection = builder.chroma_client.get_collection(IndexBuilder.COLLECTION_NAME)
+    assert collection.metadata["embed_model"] == builder.embed_model
+    assert collection.count() == 2
+
+
+def test_incremental_skips_unchanged_chunks(builder, fake_embeddings):
+    """Test that re-indexing unchanged pages makes no embeddings calls."""
+    run_build(builder, make_docs(3), reset=True)
+    fake_embeddings.texts.clear()
+
+    stats = run_build(builder, make_docs(3), reset=False)
+
+    assert fake_embeddings.texts == []
+    assert stats["total_chunks"] == 6
+    assert builder.chroma_client.get_collection(IndexBuilder.COLLECTION_NAME).count() == 6
+
+
+def test_incremental_reembeds_changed_chunks(builder, fake_embeddings):
+    """Test that only changed chunks are re-embedded and their old versions removed."""
+    run_build(builder, make_docs(3), reset=True)
+    fake_embeddings.texts.clear()
+
+    run_build(builder, make_docs(3, changed={1}), reset=False)
+
+    # Only the last chunk of page 1 changed
+    assert len(fake_embeddings.texts) == 1
+    assert fake_embeddings.texts[0].endswith("updated")
+
+    collection = builder.chroma_client.get_collection(IndexBuilder.COLLECTION_NAME)
+    documents = collection.get(include=["documents"])["documents"]
+    assert len(documents) == 6
+    assert sum(document.endswith("updated") for document in documents) == 1
+
+
+def test_incremental_prunes_removed_pages(builder):
+    """Test that chunks of pages no longer crawled are deleted."""
+    run_build(builder, make_docs(3), reset=True)
+
+    run_build(builder, make_docs(2), reset=False)
+
+    collection = builder.chroma_client.get_collection(IndexBuilder.COLLECTION_NAME)
+    urls = {metadata["url"] for metadata in collection.get(include=["metadatas"])["metadatas"]}
+    assert urls == {"https://www.uwp.edu/p0", "https://www.uwp.edu/p1"}
+    assert collection.count() == 4
+
+
+def test_incremental_updates_changed_titles(builder):
+    """Test that a title change with unchanged text refreshes the stored title."""
+    run_build(builder, make_docs(2), reset=True)
+
+    run_build(builder, make_docs(2, titles={0: "Renamed"}), reset=False)
+
+    collection = builder.chroma_client.get_collection(IndexBuilder.COLLECTION_NAME)
+    metadatas = collection.get(include=["metadatas"])["metadatas"]
+    titles = {metadata["url"]: metadata["title"] for metadata in metadatas}
+    assert titles == {"https://www.uwp.edu/p0": "Renamed", "https://www.uwp.edu/p1": "Page 1"}
+    assert len(metadatas) == 4
+    assert all("page_index" not in metadata for metadata in metadatas)
+
+
+def test_ingest_fails_cleanly_when_indexing_fails_with_full_page_queue(
+    tmp_path, fake_embeddings, monkeypatch
+):
+    """Test that an indexing error with a full page queue ends the ingest."""
+    class EndlessScraper(UWPScraper):
+        PAGE_QUEUE_SIZE = 2
+
+        async def _crawl(self, seed_url, pages):
+            doc = make_docs(1)[0]
+            for i in range(10_000):
+                await pages.put({**doc, "url": f"https://www.uwp.edu/p{i}"})
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("embeddings unavailable")
+
+    monkeypatch.setattr(fake_embeddings, "create", fail)
+    monkeypatch.setattr(ingest, "UWPScraper", EndlessScraper)
+    monkeypatch.setattr(ingest, "STATUS_FILE", tmp_path / "data" / "ingest_status.json")
+    monkeypatch.setattr(ingest, "_STATUS_CACHE", {})
+    settings = Settings(OPENAI_API_KEY="test-key", CHROMA_PATH=str(tmp_path / "chroma"))
+
+    worker = threading.Thread(
+        target=ingest.run_ingest_task, args=(10, settings, "2024-01-01T00:00:00"), daemon=True
+    )
+    worker.start()
+    worker.join(timeout=30)
+
+    assert not worker.is_alive()
+    status = ingest.load_status()
+    assert status.status == "error"
+    assert status.error_message == "embeddings unavailable"
@@ -0,0 +1,101 @@
+"""Tests for ingest status persistence."""
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.main import app
+from app.models import IngestStatus
+from app.routers import ingest
+
+
+@pytest.fixture
+def status_file(tmp_path, monkeypatch):
+    """Point the status file at a temporary location."""
+    path = tmp_path / "data" / "ingest_status.json"
+    monkeypatch.setattr(ingest, "STATUS_FILE", path)
+    monkeypatch.setattr(ingest, "_STATUS_CACHE", {})
+    return path
+
+
+def test_load_status_missing_file(status_file):
+    """Test that a missing status file reads as idle."""
+    assert ingest.load_status().status == "idle"
+
+
+def test_save_and_load_status(status_file):
+    """Test status round-trip and that unchanged files are served from cache."""
+    ingest.save_status(IngestStatus(status="running", started_at="2024-01-01T00:00:00"))
+
+    first = ingest.load_status()
+    assert first.status == "running"
+    assert first.started_at == "2024-01-01T00:00:00"
+    assert ingest.load_status() is first
+
+    # No temp file left behind after the atomic rename
+    assert list(status_file.parent.iterdir()) == [status_file]
+
+    # A new write is picked up
+    ingest.save_status(IngestStatus(status="done", pages_scraped=12, chunks_indexed=40))
+    second = ingest.load_status()
+    assert second.status == "done"
+    assert second.chunks_indexed == 40
+
+
+def test_load_status_corrupt_file(status_file):
+    """Test that an unreadable status file reads as idle."""
+    status_file.parent.mkdir(parents=True)
+    status_file.write_text("{not json")
+
+    assert ingest.load_status().status == "idle"
+
+
+def test_load_status_invalid_fields(status_file):
+    """Test that a status file with unexpected content reads as idle."""
+    status_file.parent.mkdir(parents=True)
+    status_file.write_text('["running"]')
+
+    assert ingest.load_status().status == "idle"
+
+
+def test_ingest_status_is_frozen():
+    """Test that status objects can't be mutated (cached copies are shared)."""
+    status = IngestStatus(status="idle")
+
+    with pytest.raises(ValidationError):
+        status.status = "running"
+
+
+async def test_load_status_async(status_file, monkeypatch):
+    """Test that unchanged status is served without a thread hop."""
+    ingest.save_status(IngestStatus(status="running"))
+    first = await ingest.load_status_async()
+    assert first.status == "running"
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("status file re-read while unchanged")
+
+    monkeypatch.setattr(ingest.asyncio, "to_thread", fail)
+    assert await ingest.load_status_async() is first
+
+
+def test_start_ingest_rejects_second_start(status_file, monkeypatch):
+    """Test that a second start is refused while the first is starting up."""
+    release = threading.Event()
+    monkeypatch.setattr(ingest, "run_ingest_task", lambda *args: release.wait(5))
+    monkeypatch.setattr(ingest, "_INGEST_FUTURE", None)
+
+    with TestClient(app) as client:
+        retriever_before = app.state.retriever
+
+        assert client.post("/ingest/start", json={}).status_code == 200
+        assert ingest.load_status().status == "running"
+        assert client.post("/ingest/start", json={}).status_code == 409
+
+        release.set()
+        ingest._INGEST_FUTURE.result()
+        ingest._EXECUTOR.submit(lambda: None).result()  # Done-callbacks have run
+
+        # Index handles are reopened once the ingest finishes
+        assert app.state.retriever is not retriever_before
@@ -1,6 +1,6 @@
 """Tests for retriever functionality."""
 import pytest
-from unittest.mock import Mock, MagicMock
+from unittest.mock import AsyncMock, Mock, MagicMock
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 
@@ -14,9 +14,9 @@ def mock_openai_client():
 
     # Mock embeddings response
     mock_embedding = [0.1] * 1536  # Simulated embedding vector
-    client.embeddings.create.return_value = Mock(
+    client.embeddings.create = AsyncMock(return_value=Mock(
         data=[Mock(embedding=mock_embedding)]
-    )
+    ))
 
     return client
 
@@ -28,6 +28,7 @@ def in_memory_chroma():
         is_persistent=False,
         allow_reset=True
     ))
+    client.reset()  # Ephemeral clients share in-process state between tests
 
     # Create collection
     collection = client.create_collection(name="uwp")
@@ -57,18 +58,18 @@ def in_memory_chroma():
         embeddings=test_embeddings
     )
 
-    return client
+    return collection
 
 
-def test_retriever_query(in_memory_chroma, mock_openai_client):
+async def test_retriever_query(in_memory_chroma, mock_openai_client):
     """Test that retriever returns relevant chunks."""
     retriever = Retriever(
-        chroma_client=in_memory_chroma,
+        collection=in_memory_chroma,
         openai_client=mock_openai_client,
         embed_model="text-embedding-3-small"
     )
 
-    results = retriever.query("What programs does UW-Parkside offer?", k=3)
+    results = await retriever.query("What programs does UW-Parkside offer?", k=3)
 
     # Should return results
     assert len(results) > 0
@@ -85,10 +86,41 @@ def test_retriever_query(in_memory_chroma, mock_openai_client):
     mock_openai_client.embeddings.create.assert_called_once()
 
 
+async def test_retriever_caches_query_embeddings(in_memory_chroma, mock_openai_client):
+    """Test that repeated questions reuse the cached query embedding."""
+    retriever = Retriever(
+        collection=in_memory_chroma,
+        openai_client=mock_openai_client,
+        embed_model="text-embedding-3-small"
+    )
+
+    await retriever.query("What are the library hours?", k=3)
+    await retriever.query("  what are the LIBRARY   hours?", k=3)
+
+    # Same normalized question should only be embedded once
+    mock_openai_client.embeddings.create.assert_called_once()
+
+
+async def test_retriever_cache_keeps_punctuation(in_memory_chroma, mock_openai_client):
+    """Test that questions differing only in punctuation are embedded separately."""
+    retriever = Retriever(
+        collection=in_memory_chroma,
+        openai_client=mock_openai_client,
+        embed_model="text-embedding-3-small"
+    )
+
+    await retriever.query("Does UWP offer C++ courses?", k=3)
+    await retriever.query("Does UWP offer C# courses?", k=3)
+    await retriever.query("Is a 2.5 GPA enough?", k=3)
+    await retriever.query("Is a 25 GPA enough?", k=3)
+
+    assert mock_openai_client.embeddings.create.call_count == 4
+
+
 def test_retriever_has_confident_match(in_memory_chroma, mock_openai_client):
     """Test confidence threshold checking."""
     retriever = Retriever(
-        chroma_client=in_memory_chroma,
+        collection=in_memory_chroma,
         openai_client=mock_openai_client,
         embed_model="text-embedding-3-small"
     )
@@ -109,21 +141,20 @@ def test_retriever_has_confident_match(in_memory_chroma, mock_openai_client):
     assert retriever.has_confident_match([]) is False
 
 
-def test_retriever_no_collection():
-    """Test retriever behavior when collection doesn't exist."""
+async def test_retriever_empty_collection(mock_openai_client):
+    """Test retriever behavior when the collection has not been populated."""
     client = chromadb.Client(ChromaSettings(
         is_persistent=False,
         allow_reset=True
     ))
-
-    mock_openai = Mock()
+    client.reset()
 
     retriever = Retriever(
-        chroma_client=client,
-        openai_client=mock_openai,
+        collection=client.create_collection(name="uwp"),
+        openai_client=mock_openai_client,
         embed_model="text-embedding-3-small"
     )
 
-    # Should return empty list when collection doesn't exist
-    results = retriever.query("test question", k=5)
+    # Should return empty list when there is nothing to retrieve
+    results = await retriever.query("test question", k=5)
     assert results == []
@@ -0,0 +1,71 @@
+"""Tests for the UW-Parkside scraper."""
+import asyncio
+
+import httpx
+import pytest
+
+from app.rag.scrape_uwp import UWPScraper
+
+
+PAGE_TEXT = "Café hours and résumé workshops for naïve first-year students. " * 20
+
+
+@pytest.fixture
+async def scraper():
+    """Scraper whose HTTP client is swapped for a mock transport per test."""
+    scraper = UWPScraper(max_pages=10, throttle_ms=0)
+    yield scraper
+    await scraper.close()
+
+
+def serve(scraper, handler):
+    """Route the scraper's requests to `handler`."""
+    scraper.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def test_scrape_page_uses_header_charset(scraper):
+    """Test that a page declaring its charset only in Content-Type decodes correctly."""
+    body = (
+        "<html><head><title>Café Résumé</title></head>"
+        f"<body><article><p>{PAGE_TEXT}</p></article></body></html>"
+    ).encode("utf-8")
+    serve(scraper, lambda request: httpx.Response(
+        200, content=body, headers={"Content-Type": "text/html; charset=utf-8"}
+    ))
+
+    page, _ = await scraper.scrape_page("https://www.uwp.edu/cafe")
+
+    assert page["title"] == "Café Résumé"
+    assert "résumé workshops for naïve" in page["text"]
+
+
+async def test_scrape_page_defaults_to_utf8(scraper):
+    """Test that a page with no declared charset is read as UTF-8."""
+    body = f"<html><head><title>Café</title></head><body><p>{PAGE_TEXT}</p></body></html>"
+    serve(scraper, lambda request: httpx.Response(
+        200, content=body.encode("utf-8"), headers={"Content-Type": "text/html"}
+    ))
+
+    page, _ = await scraper.scrape_page("https://www.uwp.edu/cafe")
+
+    assert page["title"] == "Café"
+
+
+async def test_requests_to_a_host_are_spaced_across_workers():
+    """Test that concurrent page fetches share one per-host throttle."""
+    scraper = UWPScraper(max_pages=10, throttle_ms=50, concurrency=4)
+    started = []
+
+    def handler(request):
+        started.append(asyncio.get_running_loop().time())
+        return httpx.Response(404)
+
+    serve(scraper, handler)
+    try:
+        await asyncio.gather(*[scraper.scrape_page(f"https://www.uwp.edu/p{i}") for i in range(4)])
+    finally:
+        await scraper.close()
+
+    gaps = [later - earlier for earlier, later in zip(started, started[1:])]
+    assert len(gaps) == 3
+    assert min(gaps) >= 0.045